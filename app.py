@@ -12,6 +12,9 @@ INTRO_MESSAGE = (
     "• \"What are some up-and-coming rental markets over the last 3 years?\""
 )
 
+# Only the most recent messages are kept in the chat state (20 turns)
+MAX_HISTORY_MESSAGES = 40
+
 
 def respond(message, history):
     """
@@ -27,15 +30,22 @@ def respond(message, history):
     """
     history = history or []
 
+    # Ignore empty submits instead of adding a blank turn to the chat
+    if not (message or "").strip():
+        return history, ""
+
     # Call your core chat function — it returns a string reply
     reply = chat(message, history)
 
     # Append user and assistant messages in the expected format
-    history.append({"role": "user", "content": message})
-    history.append({"role": "assistant", "content": reply})
+    history.extend((
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": reply},
+    ))
 
-    # Return updated history and clear the input box
-    return history, ""
+    # Return the most recent messages (the whole history is sent back to the
+    # browser every turn) and clear the input box
+    return history[-MAX_HISTORY_MESSAGES:], ""
 
 
 def reset_chat():
@@ -46,26 +56,42 @@ def reset_chat():
     return [{"role": "assistant", "content": INTRO_MESSAGE}], ""
 
 
-with gr.Blocks() as demo:
-    gr.Markdown(
-        "# 🏙️ Apartment Relocation Assistant\n"
-        "Ask about your monthly rent budget, cheapest metros, or compare cities."
-    )
+# Up to this many respond() calls run at once; further submits wait in a
+# queue of at most MAX_QUEUE_SIZE.
+CONCURRENCY_LIMIT = 4
+MAX_QUEUE_SIZE = 32
+
+
+def build_demo() -> gr.Blocks:
+    """
+    Build the Gradio UI. Kept out of module scope so importing `app`
+    (e.g. to reuse `respond`) doesn't construct any widgets.
+    """
+    with gr.Blocks() as demo:
+        gr.Markdown(
+            "# 🏙️ Apartment Relocation Assistant\n"
+            "Ask about your monthly rent budget, cheapest metros, or compare cities."
+        )
+
+        # Start the chatbot with a greeting from the assistant
+        chatbot = gr.Chatbot(
+            value=[{"role": "assistant", "content": INTRO_MESSAGE}],
+            height=400,
+            show_label=False,
+        )
+        msg = gr.Textbox(
+            placeholder="Example: I have a $2500 budget in CA.",
+            label="Your message",
+        )
+        clear = gr.Button("Clear chat")
+
+        msg.submit(respond, [msg, chatbot], [chatbot, msg])
+        clear.click(reset_chat, None, [chatbot, msg])
 
-    # Start the chatbot with a greeting from the assistant
-    chatbot = gr.Chatbot(
-        value=[{"role": "assistant", "content": INTRO_MESSAGE}],
-        height=400,
-        show_label=False,
-    )
-    msg = gr.Textbox(
-        placeholder="Example: I have a $2500 budget in CA.",
-        label="Your message",
-    )
-    clear = gr.Button("Clear chat")
+    return demo
 
-    msg.submit(respond, [msg, chatbot], [chatbot, msg])
-    clear.click(reset_chat, None, [chatbot, msg])
 
 if __name__ == "__main__":
-    demo.launch()
+    demo = build_demo()
+    demo.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=MAX_QUEUE_SIZE)
+    demo.launch(show_api=False, share=False)
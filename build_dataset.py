@@ -0,0 +1,13 @@
+"""
+Rebuild data/rent.parquet from the cleaned CSV.
+
+Run this whenever `data/new cleaned data.csv` changes:
+
+    python build_dataset.py
+"""
+from recommender import write_parquet
+
+
+if __name__ == "__main__":
+    path = write_parquet()
+    print(f"Wrote {path}")
@@ -1,40 +1,78 @@
 import pandas as pd
 import numpy as np
-import re
 import os
 import sys
 import time
 
+def _is_date_col(col):
+    """Cheap check for a YYYY-MM-DD column name."""
+    return (
+        len(col) >= 10 and col[4] == '-' and col[7] == '-'
+        and col[:4].isdecimal() and col[5:7].isdecimal() and col[8:10].isdecimal()
+    )
+
 def clean_rental_data(input_file, output_file):
     print(f"Loading data from {input_file}...")
-    # Load the dataset
-    df = pd.read_csv(input_file)
 
     # 1. Identify Metadata Columns vs Date Columns
     metadata_cols = ['RegionID', 'SizeRank', 'RegionName', 'RegionType', 'StateName']
     
+    # Read just the header first so the full load can skip every column we
+    # don't need (all the pre-2021 months)
+    header = pd.read_csv(input_file, nrows=0).columns
+
     # Get all columns that are dates (formatted as YYYY-MM-DD in the CSV)
-    date_cols = [col for col in df.columns if re.match(r'\d{4}-\d{2}-\d{2}', col)]
+    date_cols = [col for col in header if _is_date_col(col)]
     
     print(f"Found {len(date_cols)} monthly data columns.")
 
     # 2. Filter for Data Starting from 2021
     years_of_interest = [2021, 2022, 2023, 2024, 2025]
+
+    # Keep only the months we care about, in chronological order, so each
+    # year's months form one contiguous block of columns.
+    year_map = {col: int(col[:4]) for col in date_cols}
+    wanted_cols = sorted(col for col, year in year_map.items() if year in years_of_interest)
+
+    # Load the dataset (only the metadata + wanted months, parsed as float32)
+    df = pd.read_csv(
+        input_file,
+        usecols=metadata_cols + wanted_cols,
+        dtype={col: np.float32 for col in wanted_cols},
+    )
     
     cleaned_df = df[metadata_cols].copy()
 
     print("Aggregating monthly data into annual averages...")
-    
+
+    col_years = np.array([year_map[col] for col in wanted_cols], dtype=np.int64)
+    present_years, block_starts = np.unique(col_years, return_index=True)
+
     for year in years_of_interest:
-        # Find all columns for this specific year
-        year_cols = [col for col in date_cols if col.startswith(str(year))]
-        
-        if not year_cols:
+        if year not in present_years:
             print(f"No data found for year {year}, skipping.")
-            continue
-            
-        # Calculate the mean for this year across the rows (axis=1)
-        cleaned_df[f'{year}_Avg_Rent'] = df[year_cols].mean(axis=1).round(0)
+
+    if len(wanted_cols):
+        # One pass over the whole date block: per-year NaN-skipping means via
+        # np.add.reduceat, the same result as df[year_cols].mean(axis=1).
+        values = df[wanted_cols].to_numpy(dtype=np.float32)
+        observed = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(observed, values, 0), block_starts, axis=1, dtype=np.float64)
+        counts = np.add.reduceat(observed, block_starts, axis=1, dtype=np.int64)
+
+        # Divide and round straight into one preallocated float32 buffer
+        # rather than materialising float64 intermediates per step.
+        means = np.empty((len(df), len(present_years)), dtype=np.float32)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.divide(sums, counts, out=means, casting='same_kind')
+        np.round(means, out=means)
+
+        annual_df = pd.DataFrame(
+            means,
+            columns=[f'{year}_Avg_Rent' for year in present_years],
+            index=cleaned_df.index,
+        )
+        cleaned_df = pd.concat([cleaned_df, annual_df], axis=1)
 
     # 3. Data Cleaning & Formatting
     
@@ -69,9 +107,18 @@ def clean_rental_data(input_file, output_file):
         print("Renamed 'RegionName' column to 'City'")
 
     # 4. Save to CSV (overwrites existing files)
-    cleaned_df.to_csv(output_file, index=False)
+    cleaned_df.to_csv(output_file, index=False, chunksize=10000, lineterminator="\n")
     print(f"Success! Cleaned data saved to CSV: {output_file} (overwritten if existed)")
 
+    # 7. Also save the Parquet copy the app loads (rent.parquet next to the
+    # CSV), so the app doesn't fall back to parsing the CSV after a rerun
+    parquet_file = os.path.join(os.path.dirname(output_file), 'rent.parquet')
+    try:
+        cleaned_df.to_parquet(parquet_file, index=False, compression="snappy")
+        print(f"Saved Parquet copy: {parquet_file}")
+    except ImportError:
+        print("pyarrow is not installed; skipping rent.parquet (the app will read the CSV).")
+
     return output_file
 
 def get_input_file():
@@ -1,39 +1,235 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+import functools
+import glob
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
 
 # A small, instruction-tuned model that works on CPU
 MODEL_NAME = "google/flan-t5-small"
 
+# Where the exported + int8-quantized ONNX copy of MODEL_NAME is kept
+_ONNX_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "models", "flan-t5-small-int8"
+)
+
+# Concurrent polish requests are coalesced into one batched model call:
+# up to _BATCH_SIZE prompts arriving within _BATCH_WINDOW_S of each other.
+_BATCH_SIZE = 8
+_BATCH_WINDOW_S = 0.02
+# How long a caller waits for its polished text before giving up (the
+# chatbot then falls back to the unpolished answer)
+_RESULT_TIMEOUT_S = 60.0
+# Output tokens allowed beyond the longest prompt in a batch
+_EXTRA_OUTPUT_TOKENS = 32
+
 _tokenizer = None
 _model = None
 _pipe = None
 
+_requests: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _quantized_file_names(model_dir: str) -> dict:
+    """
+    Map ORTModelForSeq2SeqLM file-name arguments to the quantized graphs in
+    model_dir. Newer optimum exports a single merged decoder instead of the
+    decoder / decoder-with-past pair; pass whichever files exist.
+    """
+    available = {os.path.basename(p) for p in glob.glob(os.path.join(model_dir, "*.onnx"))}
+    file_names = {}
+    for arg, stems in (
+        ("encoder_file_name", ("encoder_model",)),
+        ("decoder_file_name", ("decoder_model_merged", "decoder_model")),
+        ("decoder_with_past_file_name", ("decoder_with_past_model",)),
+    ):
+        for stem in stems:
+            if f"{stem}_quantized.onnx" in available:
+                file_names[arg] = f"{stem}_quantized.onnx"
+                break
+    return file_names
+
+
+def _is_complete(model_dir: str) -> bool:
+    """True if model_dir holds a config plus quantized encoder and decoder graphs."""
+    file_names = _quantized_file_names(model_dir)
+    return (
+        os.path.isfile(os.path.join(model_dir, "config.json"))
+        and "encoder_file_name" in file_names
+        and "decoder_file_name" in file_names
+    )
+
+
+def _load_quantized_model():
+    """
+    Load MODEL_NAME as a dynamically int8-quantized ONNX Runtime model.
+
+    The first call exports the model to ONNX and quantizes the encoder and
+    decoder graphs into _ONNX_DIR; later calls load the quantized files
+    directly. The export is built in a temporary directory and only moved
+    to _ONNX_DIR once it is complete, so an interrupted run is redone next
+    time rather than leaving a half-written model behind. Raises
+    ImportError if optimum[onnxruntime] is not installed.
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    if not _is_complete(_ONNX_DIR):
+        parent = os.path.dirname(_ONNX_DIR)
+        os.makedirs(parent, exist_ok=True)
+        build_dir = tempfile.mkdtemp(prefix=".flan-t5-small-int8-", dir=parent)
+        try:
+            export_dir = os.path.join(build_dir, "fp32")
+            ort_model = ORTModelForSeq2SeqLM.from_pretrained(
+                MODEL_NAME, export=True, provider="CPUExecutionProvider"
+            )
+            ort_model.save_pretrained(export_dir)
+
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            for onnx_path in glob.glob(os.path.join(export_dir, "*.onnx")):
+                quantizer = ORTQuantizer.from_pretrained(
+                    export_dir, file_name=os.path.basename(onnx_path)
+                )
+                quantizer.quantize(save_dir=build_dir, quantization_config=qconfig)
+            if not os.path.exists(os.path.join(build_dir, "config.json")):
+                shutil.copy(os.path.join(export_dir, "config.json"), build_dir)
+
+            if not _is_complete(build_dir):
+                raise RuntimeError(f"Incomplete int8 export of {MODEL_NAME} in {build_dir}")
+
+            # Swap the finished export in, replacing any partial one
+            shutil.rmtree(_ONNX_DIR, ignore_errors=True)
+            os.rename(build_dir, _ONNX_DIR)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    return ORTModelForSeq2SeqLM.from_pretrained(
+        _ONNX_DIR, provider="CPUExecutionProvider", **_quantized_file_names(_ONNX_DIR)
+    )
+
 
 def get_pipeline():
     global _tokenizer, _model, _pipe
     if _pipe is None:
+        # Imported lazily: transformers pulls in torch, which is only worth
+        # paying for once a response actually needs polishing.
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+
         _tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-        _model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+        if _tokenizer.pad_token is None:
+            # Batched prompts have different lengths and must be padded
+            _tokenizer.pad_token = _tokenizer.eos_token
+        try:
+            _model = _load_quantized_model()
+        except ImportError:
+            # optimum isn't installed: fall back to the plain FP32 model
+            _model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
         _pipe = pipeline(
             "text2text-generation",
             model=_model,
             tokenizer=_tokenizer,
+            batch_size=_BATCH_SIZE,
         )
     return _pipe
 
 
+def _batch_worker() -> None:
+    """Drain _requests forever, running each gathered batch through the model once."""
+    while True:
+        batch = [_requests.get()]
+        deadline = time.monotonic() + _BATCH_WINDOW_S
+        while len(batch) < _BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            _run_batch(batch)
+        except BaseException as exc:
+            # Whatever went wrong, no caller may be left waiting forever
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+
+
+def _run_batch(batch: "list[tuple[str, Future]]") -> None:
+    """Run one batch through the model and resolve each request's future."""
+    prompts = [prompt for prompt, _ in batch]
+    pipe = get_pipeline()
+    # The polished text restates the draft, so size the output budget from
+    # the longest prompt (which contains its draft) rather than a fixed cap
+    # that could cut a long list of numbers short.
+    longest = max(len(ids) for ids in _tokenizer(prompts)["input_ids"])
+    # Greedy decoding: a second beam doubles decoder work for little
+    # gain on a rewrite task.
+    outputs = pipe(
+        prompts,
+        batch_size=len(prompts),
+        max_length=longest + _EXTRA_OUTPUT_TOKENS,
+        num_beams=1,
+        do_sample=False,
+    )
+    if len(outputs) != len(batch):
+        raise RuntimeError(f"Expected {len(batch)} generations, got {len(outputs)}")
+
+    for (_, future), out in zip(batch, outputs):
+        if isinstance(out, list):
+            out = out[0]
+        future.set_result(out["generated_text"].strip())
+
+
+def _submit(prompt: str) -> Future:
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _worker_lock:
+            # (Re)start the worker on first use, or if it has died
+            if _worker is None or not _worker.is_alive():
+                _worker = threading.Thread(
+                    target=_batch_worker, name="llm-polish-batcher", daemon=True
+                )
+                _worker.start()
+    future: Future = Future()
+    _requests.put((prompt, future))
+    return future
+
+
+def _normalize_draft(text: str) -> str:
+    """Collapse runs of whitespace within each line so near-identical drafts share a cache entry."""
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines())
+
+
+@functools.lru_cache(maxsize=512)
+def _polish_cached(prompt: str) -> str:
+    # Decoding is greedy and therefore deterministic, which is what makes
+    # caching on the prompt safe. A failure or timeout raises, so it is
+    # never cached.
+    return _submit(prompt).result(timeout=_RESULT_TIMEOUT_S)
+
+
 def polish_response(raw_answer: str, user_message: str) -> str:
     """
     Use the LLM to rewrite the structured/raw answer to sound friendlier.
+
+    Results are memoized on the full prompt, so repeated questions that
+    produce the same draft don't re-run the model.
     """
-    pipe = get_pipeline()
     prompt = (
         "You are a helpful relocation assistant. "
         "Rewrite the assistant message to be concise, friendly, and easy to read. "
         "Preserve all numbers and facts.\n\n"
-        f"User message:\n{user_message}\n\n"
-        f"Draft assistant answer:\n{raw_answer}\n\n"
+        f"User message:\n{user_message.strip()}\n\n"
+        f"Draft assistant answer:\n{_normalize_draft(raw_answer)}\n\n"
         "Polished answer:"
     )
-
-    out = pipe(prompt, max_length=256, num_beams=2)[0]["generated_text"]
-    return out.strip()
+    return _polish_cached(prompt)
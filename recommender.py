@@ -1,6 +1,9 @@
+import functools
 import os
-from typing import Optional, Dict, Literal
+import threading
+from typing import Optional, Dict, Literal, Tuple
 
+import numpy as np
 import pandas as pd
 
 # ---- Configuration ----
@@ -8,13 +11,62 @@ import pandas as pd
 # Name of the cleaned rent dataset (you can change this if you rename the file)
 _DATA_FILENAME = "new cleaned data.csv"
 
+# Columns read from the cleaned CSV, parsed straight into their final dtypes
+# (float32 rents, categorical names/states); anything else is skipped
+_CSV_RENT_COLUMNS = [
+    "2021_Avg_Rent", "2022_Avg_Rent", "2023_Avg_Rent",
+    "2024_Avg_Rent", "2025_Avg_Rent", "Current_Rent",
+]
+_CSV_DTYPES = {
+    "City": "category",
+    "StateName": "category",
+    **{c: "float32" for c in _CSV_RENT_COLUMNS},
+}
+
+# Columnar copy of the CSV's source columns, so startup skips CSV parsing.
+# Derived columns are always computed at load time, never stored in it.
+# (written by the cleaner; `python build_dataset.py` rebuilds it from the CSV)
+_PARQUET_FILENAME = "rent.parquet"
+
 # Cache for the loaded DataFrame
 _DATA_CACHE: Optional[pd.DataFrame] = None
-
-
-def _get_data_path() -> str:
+# Serializes the first load so concurrent callers don't each parse the data
+_DATA_LOCK = threading.Lock()
+
+# Lowercased RegionName -> row position of its first occurrence in _DATA_CACHE
+_REGION_INDEX: Dict[str, int] = {}
+# ...and the same lowercased names as a fixed-width NumPy string array, for
+# the substring fallback when there is no exact match
+_REGION_LOWER_NP: Optional[np.ndarray] = None
+
+# Rows of _DATA_CACHE with a Current_Rent, sorted by it, plus the sorted rent
+# values themselves, so budget filters are a binary search + slice
+_DATA_BY_RENT: Optional[pd.DataFrame] = None
+_RENT_VALUES: Optional[np.ndarray] = None
+
+# _DATA_BY_RENT partitioned by State_upper (each partition still rent-sorted),
+# so state-scoped queries start from that state's rows instead of a scan
+_BY_STATE: Dict[str, pd.DataFrame] = {}
+# ...and each partition's Current_Rent as a plain NumPy array
+_BY_STATE_RENTS: Dict[str, np.ndarray] = {}
+
+# Fields returned per metro by compare_metros, and their column positions
+# in _DATA_CACHE (filled in by load_data)
+_COMPARE_COLS = (
+    "RegionName", "State", "Current_Rent",
+    "rent_3yr_pct_change", "rent_5yr_pct_change", "trend_label",
+)
+_COL_POS: Dict[str, int] = {}
+
+# How many distinct argument combinations each query function remembers.
+# The chatbot repeats the same (budget, state, trend, limit) lookups a lot,
+# and the underlying data never changes once loaded.
+_QUERY_CACHE_SIZE = 256
+
+
+def _get_data_path(filename: str = _DATA_FILENAME) -> str:
     """
-    Resolve the path to the cleaned rent dataset.
+    Resolve the path to the cleaned rent dataset (or another file in data/).
 
     Assumes this file lives in the same folder as recommender.py and that
     the CSV is inside a 'data' subfolder:
@@ -25,14 +77,19 @@ def _get_data_path() -> str:
           recommender.py
           data/
             new cleaned data.csv
+            rent.parquet
     """
     here = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(here, "data", _DATA_FILENAME)
+    return os.path.join(here, "data", filename)
+
+
+# All possible trend labels, stored as a small categorical
+_TREND_DTYPE = pd.CategoricalDtype(["unknown", "falling", "flat", "rising"])
 
 
 def _compute_growth_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Add growth-related columns to the DataFrame in-place and return it.
+    Return the DataFrame with growth-related columns added.
 
     Computes:
     - rent_3yr_change
@@ -40,84 +97,213 @@ def _compute_growth_columns(df: pd.DataFrame) -> pd.DataFrame:
     - rent_5yr_change
     - rent_5yr_pct_change
     - trend_label (simple 'rising' / 'flat' / 'falling' based on 3yr % change)
+
+    The input frame is not modified; all new columns are added with a
+    single df.assign().
     """
-    # We assume yearly columns exist; if not, this will raise clearly.
-    # You can guard with `if "2022_Avg_Rent" in df.columns` if needed.
-    df = df.copy()
-
-    # 3-year: 2022 -> Current
-    if {"2022_Avg_Rent", "Current_Rent"}.issubset(df.columns):
-        df["rent_3yr_change"] = df["Current_Rent"] - df["2022_Avg_Rent"]
-        df["rent_3yr_pct_change"] = (
-            (df["rent_3yr_change"] / df["2022_Avg_Rent"]) * 100.0
+    # The arithmetic runs on raw float32 arrays (float32 is plenty for rents
+    # and percentages and halves the bytes every filter/sort has to touch)
+    # rather than on pandas Series, so there is no per-op index alignment.
+    cols: Dict[str, np.ndarray] = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if "Current_Rent" in df.columns:
+            cur = df["Current_Rent"].to_numpy(dtype="float32")
+
+            # 3-year: 2022 -> Current
+            if "2022_Avg_Rent" in df.columns:
+                r22 = df["2022_Avg_Rent"].to_numpy(dtype="float32")
+                c3 = np.subtract(cur, r22)
+                cols["rent_3yr_change"] = c3
+                cols["rent_3yr_pct_change"] = np.divide(c3, r22) * np.float32(100.0)
+
+            # 5-year: 2021 -> Current
+            if "2021_Avg_Rent" in df.columns:
+                r21 = df["2021_Avg_Rent"].to_numpy(dtype="float32")
+                c5 = np.subtract(cur, r21)
+                cols["rent_5yr_change"] = c5
+                cols["rent_5yr_pct_change"] = np.divide(c5, r21) * np.float32(100.0)
+
+    # Simple trend label from 3-year % change, vectorized:
+    # NaN -> unknown, > 10% -> rising, < -5% -> falling, otherwise flat
+    pct = cols.get("rent_3yr_pct_change")
+    if pct is not None:
+        labels = np.select(
+            [np.isnan(pct), pct > 10, pct < -5],
+            ["unknown", "rising", "falling"],
+            default="flat",
         )
+    else:
+        labels = np.full(len(df), "unknown")
 
-    # 5-year: 2021 -> Current
-    if {"2021_Avg_Rent", "Current_Rent"}.issubset(df.columns):
-        df["rent_5yr_change"] = df["Current_Rent"] - df["2021_Avg_Rent"]
-        df["rent_5yr_pct_change"] = (
-            (df["rent_5yr_change"] / df["2021_Avg_Rent"]) * 100.0
-        )
+    return df.assign(**cols, trend_label=pd.Categorical(labels, dtype=_TREND_DTYPE))
 
-    # Simple trend label from 3-year % change
-    def _label_trend(pct: float) -> str:
-        if pd.isna(pct):
-            return "unknown"
-        if pct > 10:
-            return "rising"
-        if pct < -5:
-            return "falling"
-        return "flat"
-
-    if "rent_3yr_pct_change" in df.columns:
-        df["trend_label"] = df["rent_3yr_pct_change"].apply(_label_trend)
-    else:
-        df["trend_label"] = "unknown"
 
+def _read_csv() -> pd.DataFrame:
+    """Read the source columns of the cleaned CSV in their final dtypes."""
+    # pyarrow's CSV reader is multithreaded; fall back to the C parser when
+    # pyarrow is missing or fails to import (e.g. built for another numpy)
+    read_kwargs = dict(usecols=list(_CSV_DTYPES), dtype=_CSV_DTYPES)
+    try:
+        return pd.read_csv(_get_data_path(), engine="pyarrow", **read_kwargs)
+    except ImportError:
+        return pd.read_csv(_get_data_path(), engine="c", **read_kwargs)
+
+
+def _parquet_is_current(parquet_path: str) -> bool:
+    """
+    True if the Parquet file exists and is not older than the cleaned CSV,
+    so a rerun of the cleaner isn't shadowed by a stale prebuilt copy.
+    """
+    if not os.path.exists(parquet_path):
+        return False
+    csv_path = _get_data_path()
+    return not os.path.exists(csv_path) or (
+        os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    )
+
+
+def _read_parquet(parquet_path: str) -> Optional[pd.DataFrame]:
+    """
+    Read the source columns from the Parquet copy, or None if it is missing,
+    older than the CSV, or pyarrow is unavailable.
+    """
+    if not _parquet_is_current(parquet_path):
+        return None
+    try:
+        df = pd.read_parquet(parquet_path, engine="pyarrow", columns=list(_CSV_DTYPES))
+    except ImportError:
+        return None
+    return df.astype(_CSV_DTYPES)
+
+
+def _build_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the full query frame from the source columns: normalized column
+    names and every derived column load_data() documents.
+    """
+    # Normalize column names a bit (the cleaner writes the metro name
+    # as "City")
+    df = df.rename(
+        columns={
+            "City": "RegionName",
+            "StateName": "State",
+        }
+    )
+
+    # Uppercased state codes, built once so state filters are a plain
+    # equality check rather than a fillna + str.upper per query. Names and
+    # states are categorical: comparisons become small-integer compares.
+    df["State_upper"] = (
+        df["State"].astype(object).fillna("").str.upper().astype("category")
+    )
+
+    df = _compute_growth_columns(df)
+
+    # Lowercased names for case-insensitive metro lookups
+    df["RegionName_lower"] = df["RegionName"].str.lower()
     return df
 
 
+def write_parquet(path: Optional[str] = None) -> str:
+    """
+    Save the CSV's source columns as Parquet (pyarrow, snappy), so
+    load_data() can skip CSV parsing. Returns the path written.
+    """
+    path = path or _get_data_path(_PARQUET_FILENAME)
+    _read_csv().to_parquet(path, engine="pyarrow", compression="snappy", index=False)
+    return path
+
+
 def load_data() -> pd.DataFrame:
     """
     Load the cleaned rent dataset with growth columns, cached in memory.
 
+    Reads the source columns from data/rent.parquet when present, at least
+    as new as the cleaned CSV, and pyarrow is installed; otherwise from the
+    CSV. The derived columns are computed here either way.
+
     Returns:
         pandas.DataFrame with at least:
-            RegionName, StateName, Current_Rent,
+            RegionName, State, Current_Rent,
             2021_Avg_Rent, 2022_Avg_Rent, 2023_Avg_Rent,
             2024_Avg_Rent, 2025_Avg_Rent
         and computed columns:
+            State_upper, RegionName_lower,
             rent_3yr_change, rent_3yr_pct_change,
             rent_5yr_change, rent_5yr_pct_change,
             trend_label
+
+    The returned frame is shared; query functions below only filter it
+    (which yields new frames) and never modify it in place.
     """
-    global _DATA_CACHE
-    if _DATA_CACHE is None:
-        data_path = _get_data_path()
-        df = pd.read_csv(data_path)
-
-        # Normalize column names a bit
-        df = df.rename(
-            columns={
-                "StateName": "State",
+    global _DATA_CACHE, _REGION_LOWER_NP, _DATA_BY_RENT, _RENT_VALUES, _BY_STATE, _BY_STATE_RENTS
+    if _DATA_CACHE is not None:
+        return _DATA_CACHE
+
+    with _DATA_LOCK:
+        # Another thread may have finished loading while we waited
+        if _DATA_CACHE is None:
+            df = _read_parquet(_get_data_path(_PARQUET_FILENAME))
+            if df is None:
+                df = _read_csv()
+            df = _build_dataset(df)
+
+            # Exact-match index so compare_metros rarely has to scan the column
+            region_index: Dict[str, int] = {}
+            for pos, name in enumerate(df["RegionName_lower"]):
+                region_index.setdefault(name, pos)
+
+            _REGION_INDEX.clear()
+            _REGION_INDEX.update(region_index)
+            _REGION_LOWER_NP = df["RegionName_lower"].fillna("").to_numpy(dtype=str)
+            _COL_POS.clear()
+            _COL_POS.update({c: df.columns.get_loc(c) for c in _COMPARE_COLS})
+
+            by_rent = df[df["Current_Rent"].notna()].sort_values("Current_Rent", kind="stable")
+            _DATA_BY_RENT = by_rent
+            _RENT_VALUES = by_rent["Current_Rent"].to_numpy()
+            _BY_STATE = {
+                state: group
+                for state, group in by_rent.groupby("State_upper", observed=True, sort=False)
+            }
+            _BY_STATE_RENTS = {
+                state: group["Current_Rent"].to_numpy() for state, group in _BY_STATE.items()
             }
-        )
-
-        # Ensure numeric columns are floats
-        rent_cols = [
-            c
-            for c in df.columns
-            if "Rent" in c or "Avg_Rent" in c or c == "Current_Rent"
-        ]
-        for col in rent_cols:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
 
-        df = _compute_growth_columns(df)
-        _DATA_CACHE = df
+            # Published last, so a non-None cache means every index above is ready
+            _DATA_CACHE = df
 
     return _DATA_CACHE
 
 
+def reset_cache() -> None:
+    """
+    Forget the loaded frame and every memoized query result, so the next
+    load_data() reads the data files again (e.g. after rebuilding them).
+    """
+    global _DATA_CACHE
+    with _DATA_LOCK:
+        _DATA_CACHE = None
+        _find_metro_position.cache_clear()
+        for query in (filter_by_budget, cheapest_metros, most_expensive_metros, best_rent_growth):
+            query.cache_clear()
+
+
+def _rows_for_state(state: Optional[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Rent-sorted rows with a Current_Rent, limited to one state if given,
+    together with their Current_Rent values as a NumPy array.
+    Assumes load_data() has already run.
+    """
+    if state:
+        key = state.upper()
+        if key not in _BY_STATE:
+            return _DATA_BY_RENT.iloc[:0], _RENT_VALUES[:0]
+        return _BY_STATE[key], _BY_STATE_RENTS[key]
+    return _DATA_BY_RENT, _RENT_VALUES
+
+
+@functools.lru_cache(maxsize=_QUERY_CACHE_SIZE)
 def filter_by_budget(
     monthly_budget: float,
     state: Optional[str] = None,
@@ -134,28 +320,27 @@ def filter_by_budget(
         include_us_aggregate: whether to include 'United States' aggregate row.
 
     Returns:
-        DataFrame sorted by Current_Rent ascending.
+        DataFrame sorted by Current_Rent ascending. Results are cached per
+        argument combination, so treat the returned frame as read-only.
     """
-    df = load_data().copy()
+    load_data()
+    df, rents = _rows_for_state(state)
+
+    # Rows are pre-sorted by rent, so everything within budget is a prefix
+    cutoff = np.searchsorted(rents, monthly_budget, side="right")
+    df = df.iloc[:cutoff]
 
     # Filter out United States aggregate row by default
     if not include_us_aggregate:
         df = df[df["RegionName"] != "United States"]
 
-    df = df[df["Current_Rent"].notna()]
-    df = df[df["Current_Rent"] <= monthly_budget]
-
-    if state:
-        state = state.upper()
-        df = df[df["State"].fillna("").str.upper() == state]
-
     if trend:
         df = df[df["trend_label"] == trend]
 
-    df = df.sort_values("Current_Rent", ascending=True)
     return df
 
 
+@functools.lru_cache(maxsize=_QUERY_CACHE_SIZE)
 def cheapest_metros(
     limit: int = 10,
     state: Optional[str] = None,
@@ -170,23 +355,20 @@ def cheapest_metros(
         include_us_aggregate: whether to include the 'United States' row.
 
     Returns:
-        DataFrame sorted by Current_Rent ascending.
+        DataFrame sorted by Current_Rent ascending. Results are cached per
+        argument combination, so treat the returned frame as read-only.
     """
-    df = load_data().copy()
+    load_data()
+    df, _ = _rows_for_state(state)
 
     if not include_us_aggregate:
         df = df[df["RegionName"] != "United States"]
 
-    df = df[df["Current_Rent"].notna()]
-
-    if state:
-        state = state.upper()
-        df = df[df["State"].fillna("").str.upper() == state]
-
-    df = df.sort_values("Current_Rent", ascending=True)
+    # Already sorted by rent, ascending
     return df.head(limit)
 
 
+@functools.lru_cache(maxsize=_QUERY_CACHE_SIZE)
 def most_expensive_metros(
     limit: int = 10,
     state: Optional[str] = None,
@@ -201,23 +383,22 @@ def most_expensive_metros(
         include_us_aggregate: whether to include the 'United States' row.
 
     Returns:
-        DataFrame sorted by Current_Rent descending.
+        DataFrame sorted by Current_Rent descending. Results are cached per
+        argument combination, so treat the returned frame as read-only.
     """
-    df = load_data().copy()
+    load_data()
+    df, _ = _rows_for_state(state)
 
     if not include_us_aggregate:
         df = df[df["RegionName"] != "United States"]
 
-    df = df[df["Current_Rent"].notna()]
-
-    if state:
-        state = state.upper()
-        df = df[df["State"].fillna("").str.upper() == state]
-
-    df = df.sort_values("Current_Rent", ascending=False)
-    return df.head(limit)
+    # Not iloc[::-1]: reversing the rent-sorted rows would also reverse the
+    # original order among equal rents. keep="first" keeps it, matching
+    # cheapest_metros' tie order.
+    return df.nlargest(limit, "Current_Rent", keep="first")
 
 
+@functools.lru_cache(maxsize=_QUERY_CACHE_SIZE)
 def best_rent_growth(
     limit: int = 10,
     horizon: Literal["3y", "5y"] = "3y",
@@ -236,17 +417,18 @@ def best_rent_growth(
         include_us_aggregate: whether to include 'United States' row.
 
     Returns:
-        DataFrame sorted by the chosen % change.
+        DataFrame sorted by the chosen % change. Results are cached per
+        argument combination, so treat the returned frame as read-only.
     """
-    df = load_data().copy()
+    df = load_data()
+    if state:
+        # Rows without a Current_Rent have no growth figures either, so the
+        # rent-sorted state partition holds every candidate
+        df, _ = _rows_for_state(state)
 
     if not include_us_aggregate:
         df = df[df["RegionName"] != "United States"]
 
-    if state:
-        state = state.upper()
-        df = df[df["State"].fillna("").str.upper() == state]
-
     if horizon == "3y":
         col = "rent_3yr_pct_change"
     else:
@@ -254,10 +436,10 @@ def best_rent_growth(
 
     df = df[df[col].notna()]
 
-    ascending = direction == "down"
-    df = df.sort_values(col, ascending=ascending)
-
-    return df.head(limit)
+    # Partial top-K selection instead of a full sort
+    if direction == "down":
+        return df.nsmallest(limit, col)
+    return df.nlargest(limit, col)
 
 
 def compare_metros(metro_a: str, metro_b: str) -> Dict[str, Optional[Dict]]:
@@ -273,25 +455,46 @@ def compare_metros(metro_a: str, metro_b: str) -> Dict[str, Optional[Dict]]:
           "b": { ... row for metro_b ... } or None
         }
 
-    Each row dict includes growth metrics and rent columns, so the chatbot or
-    LLM layer can format a nice natural-language comparison.
+    Each row dict holds the _COMPARE_COLS fields (name, state, current rent,
+    growth metrics and trend), so the chatbot or LLM layer can format a nice
+    natural-language comparison.
     """
     df = load_data()
 
     def _find(metro: str) -> Optional[Dict]:
-        # Exact match
-        exact = df[df["RegionName"].str.lower() == metro.lower()]
-        if not exact.empty:
-            return exact.iloc[0].to_dict()
-
-        # Contains
-        subset = df[df["RegionName"].str.lower().str.contains(metro.lower())]
-        if not subset.empty:
-            return subset.iloc[0].to_dict()
-
-        return None
+        pos = _find_metro_position(metro.lower())
+        if pos is None:
+            return None
+        # Pull just the fields we need instead of boxing the whole row;
+        # NumPy scalars are unwrapped so callers still get plain floats.
+        row = {}
+        for c in _COMPARE_COLS:
+            value = df.iat[pos, _COL_POS[c]]
+            row[c] = value.item() if isinstance(value, np.generic) else value
+        return row
 
     info_a = _find(metro_a)
     info_b = _find(metro_b)
 
     return {"a": info_a, "b": info_b}
+
+
+@functools.lru_cache(maxsize=512)
+def _find_metro_position(metro_lower: str) -> Optional[int]:
+    """
+    Row position of a metro in the cached frame: exact (lowercased) name
+    match first, then the first name containing it as a plain substring.
+    """
+    load_data()
+
+    # Exact match
+    pos = _REGION_INDEX.get(metro_lower)
+    if pos is not None:
+        return pos
+
+    # Contains: one C-level substring search over all names
+    hits = np.char.find(_REGION_LOWER_NP, metro_lower) >= 0
+    if hits.any():
+        return int(hits.argmax())
+
+    return None